@@ -1,11 +1,12 @@
 """Helpers for the Speedsnake Streamlit dashboard.
 
-Provides granularity-based aggregation, CSV caching, and profiling utilities.
+Provides granularity-based aggregation, Arrow IPC caching, and profiling utilities.
 """
 
 import atexit
 import hashlib
 import logging
+import os
 import shutil
 import tempfile
 import time
@@ -29,12 +30,122 @@ GRANULARITY_OPTIONS: dict[str, str | None] = {
 METRIC_COLS = ["download_mbps", "upload_mbps", "ping_ms"]
 TIME_COL = "time"
 
+# Roughly one point per horizontal pixel on a wide chart; plotting more
+# than this only inflates the payload sent to the browser.
+MAX_PLOT_POINTS = 2000
 
-def build_cache_key(start_date: date, end_date: date, granularity: str) -> str:
-    """Return a deterministic filename for a given query combination."""
-    raw = f"{start_date.isoformat()}|{end_date.isoformat()}|{granularity}"
-    digest = hashlib.sha256(raw.encode()).hexdigest()[:16]
-    return f"{digest}.csv"
+# Coarse granularities produce a handful of rows; recomputing them is
+# cheaper than the stat + write + read of the disk cache round-trip.
+_CHEAP_GRANULARITIES = frozenset({"6-Hourly", "12-Hourly", "Daily"})
+
+# Where precompute_rollups.py writes per-interval aggregates.
+ROLLUP_DIR = "rollups"
+ROLLUP_FINGERPRINT_FILE = "fingerprint.txt"
+
+_US_PER_HOUR = 3_600_000_000
+# Fixed-width bucket sizes in microseconds. Every granularity maps to a
+# constant width because timestamps are UTC — no DST can stretch a bucket —
+# so truncation is pure integer arithmetic rather than calendar math.
+_BUCKET_US: dict[str, int] = {
+    "1h": _US_PER_HOUR,
+    "3h": 3 * _US_PER_HOUR,
+    "6h": 6 * _US_PER_HOUR,
+    "12h": 12 * _US_PER_HOUR,
+    "1d": 24 * _US_PER_HOUR,
+}
+
+
+def list_parquet_files(root: str) -> tuple[tuple[str, int, int], ...]:
+    """Collect (path, size, mtime_ns) for every parquet file under root.
+
+    Walks iteratively with os.scandir so size/mtime come from the directory
+    entries themselves — no extra stat call per file. Returns a sorted tuple
+    so the listing is deterministic regardless of directory order.
+    """
+    files: list[tuple[str, int, int]] = []
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".parquet"):
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            continue
+    return tuple(sorted(files))
+
+
+def build_fingerprint(files: tuple[tuple[str, int, int], ...]) -> str:
+    """Hash a file listing into a stable key for the loaded dataset.
+
+    Any new, removed, grown, or touched parquet file changes the key, so a
+    cache keyed on it short-circuits when nothing on disk has changed.
+    """
+    raw = "|".join(f"{path}:{size}:{mtime_ns}" for path, size, mtime_ns in files)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def scan_speedtest_files(files: tuple[tuple[str, int, int], ...]) -> pl.LazyFrame:
+    """Build the lazy plan over raw speedtest parquet files; nothing is read yet.
+
+    The cast and Mbps conversion fuse into the scan, so only the needed
+    columns are decoded and files are read in parallel at collect time.
+    Sorting here lets downstream group-bys take the sorted-run path
+    (see aggregate).
+    """
+    return (
+        pl.scan_parquet([path for path, _, _ in files], hive_partitioning=True)
+        .select(
+            pl.col("timestamp").cast(pl.Datetime("us", "UTC")),
+            # Float32 halves the bytes moved through every downstream step;
+            # a speedtest is only good to a few decimal digits anyway, and
+            # means still accumulate in f64 internally.
+            (pl.col("download").cast(pl.Float32) / 1_000_000).alias("download_mbps"),
+            (pl.col("upload").cast(pl.Float32) / 1_000_000).alias("upload_mbps"),
+            pl.col("ping").cast(pl.Float32).alias("ping_ms"),
+        )
+        .sort("timestamp")
+    )
+
+
+def load_rollup(
+    interval: str, fingerprint: str, rollup_dir: str = ROLLUP_DIR
+) -> pl.LazyFrame | None:
+    """Return a lazy scan of the precomputed rollup for an interval, if fresh.
+
+    Rollups are written by precompute_rollups.py along with the fingerprint
+    of the file set they were built from; a mismatch (or missing rollup)
+    returns None so the caller falls back to scanning the raw data. Rollup
+    rows carry one already-bucketed timestamp per interval, so they flow
+    through the same filter + aggregate pipeline as raw rows.
+    """
+    rollup_file = Path(rollup_dir) / interval / "rollup.parquet"
+    marker = Path(rollup_dir) / ROLLUP_FINGERPRINT_FILE
+    try:
+        if marker.read_text().strip() != fingerprint or not rollup_file.exists():
+            return None
+    except FileNotFoundError:
+        return None
+    logger.info("Using precomputed %s rollup", interval)
+    return pl.scan_parquet(rollup_file)
+
+
+def build_cache_key(
+    fingerprint: str, start_date: date, end_date: date, granularity: str
+) -> str:
+    """Return a deterministic filename for a given query combination.
+
+    The file-set fingerprint is part of the key so cached artifacts from
+    before a data change can never be served as fresh.
+    """
+    raw = f"{fingerprint}|{start_date.isoformat()}|{end_date.isoformat()}|{granularity}"
+    # blake2b is much faster than sha256 on short inputs and this is not a
+    # security boundary — 64 bits is plenty for the tiny query keyspace.
+    digest = hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+    return f"{digest}.arrow"
 
 
 def get_or_create_cache_dir(session_state: dict) -> str:
@@ -53,46 +164,90 @@ def get_or_create_cache_dir(session_state: dict) -> str:
 
 
 def aggregate(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame,
     granularity: str,
 ) -> pl.DataFrame:
-    """Aggregate a filtered DataFrame according to the chosen granularity.
+    """Aggregate a filtered frame according to the chosen granularity.
+
+    Accepts a LazyFrame so any upstream filter fuses with the truncate,
+    group-by and sort into one plan with a single collect — one pass over
+    the data instead of materializing each intermediate.
 
     Args:
-        df: Filtered DataFrame with a 'timestamp' column and metric columns.
+        df: Filtered frame with a 'timestamp' column and metric columns.
+            Expected to be sorted by 'timestamp' (load_data guarantees
+            this); the group-by relies on it to aggregate sorted runs
+            instead of building a hash table.
         granularity: One of the keys in GRANULARITY_OPTIONS.
 
     Returns:
         DataFrame with a 'time' column and aggregated metric columns.
     """
     interval = GRANULARITY_OPTIONS[granularity]
+    lf = df.lazy()
 
     if interval is None:
         # Raw: just rename timestamp -> time, keep metric cols
-        return df.select(
-            pl.col("timestamp").alias(TIME_COL),
-            *[pl.col(c) for c in METRIC_COLS],
-        ).sort(TIME_COL)
+        return (
+            lf.select(
+                pl.col("timestamp").alias(TIME_COL),
+                pl.col(METRIC_COLS),
+            )
+            .sort(TIME_COL)
+            .collect(engine="streaming")
+        )
 
+    # (ts // bucket) * bucket is equivalent to dt.truncate for these
+    # fixed-width UTC intervals, but vectorizes as a plain i64 kernel.
+    bucket_us = _BUCKET_US[interval]
     return (
-        df.with_columns(pl.col("timestamp").dt.truncate(interval).alias(TIME_COL))
-        .group_by(TIME_COL)
-        .agg(*[pl.col(c).mean() for c in METRIC_COLS])
-        .sort(TIME_COL)
+        lf.with_columns(
+            pl.col("timestamp")
+            .cast(pl.Int64)
+            .floordiv(bucket_us)
+            .mul(bucket_us)
+            .cast(pl.Datetime("us", "UTC"))
+            .alias(TIME_COL)
+        )
+        # Truncation is monotone, so a timestamp-sorted input yields a
+        # sorted key; telling Polars lets group_by walk runs linearly.
+        .set_sorted(TIME_COL)
+        .group_by(TIME_COL, maintain_order=True)
+        # One broadcast expression, not three nodes — the optimizer plans
+        # a single fused pass over the metric columns per bucket.
+        .agg(pl.col(METRIC_COLS).mean())
+        .collect(engine="streaming")
     )
 
 
+def downsample_for_plot(df: pl.DataFrame, target: int = MAX_PLOT_POINTS) -> pl.DataFrame:
+    """Stride-downsample a frame to roughly `target` rows for plotting.
+
+    A line chart cannot show more points than the screen has pixels, so
+    past a couple thousand rows the cost is all JSON payload and browser
+    rasterization. Frames already at or under the target pass through
+    untouched.
+    """
+    if len(df) <= target:
+        return df
+    stride = len(df) // target
+    logger.info("Downsampling %d rows with stride %d for plotting", len(df), stride)
+    return df.gather_every(stride)
+
+
 def get_aggregated_data(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame,
+    fingerprint: str,
     start_date: date,
     end_date: date,
     granularity: str,
     cache_dir: str,
 ) -> tuple[pl.DataFrame, bool]:
-    """Return aggregated data, using CSV cache if available.
+    """Return aggregated data, using Arrow IPC cache if available.
 
     Args:
-        df: Filtered DataFrame.
+        df: Filtered frame (lazy frames are only collected on a cache miss).
+        fingerprint: File-set fingerprint of the data behind df (for cache key).
         start_date: Query start date (for cache key).
         end_date: Query end date (for cache key).
         granularity: Granularity label.
@@ -101,16 +256,21 @@ def get_aggregated_data(
     Returns:
         Tuple of (result DataFrame, cache_hit bool).
     """
-    cache_file = Path(cache_dir) / build_cache_key(start_date, end_date, granularity)
+    if granularity in _CHEAP_GRANULARITIES:
+        logger.info("Skipping disk cache for cheap granularity %s", granularity)
+        return aggregate(df, granularity), False
+
+    cache_file = Path(cache_dir) / build_cache_key(fingerprint, start_date, end_date, granularity)
 
     if cache_file.exists():
         logger.info("Cache hit: %s", cache_file.name)
-        result = pl.read_csv(cache_file, try_parse_dates=True)
+        # Memory-mapped IPC read: no text parsing, schema comes back as written.
+        result = pl.read_ipc(cache_file, memory_map=True)
         return result, True
 
     logger.info("Cache miss: computing aggregation for %s", granularity)
     result = aggregate(df, granularity)
-    result.write_csv(cache_file)
+    result.write_ipc(cache_file, compression="uncompressed")
     return result, False
 
 
@@ -128,6 +288,8 @@ def profiled(label: str):
 class _ProfileContext:
     """Simple profiling context manager."""
 
+    __slots__ = ("label", "elapsed", "_start")
+
     def __init__(self, label: str):
         self.label = label
         self.elapsed: float = 0.0
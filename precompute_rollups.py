@@ -0,0 +1,75 @@
+"""Precompute per-granularity rollups of the raw speedtest data.
+
+Run after new parquet files land under uploads/:
+
+    uv run python precompute_rollups.py
+
+Writes one parquet per interval under rollups/<interval>/ holding the
+per-bucket mean of each metric plus a row count, and records the
+fingerprint of the file set the rollups were built from. The dashboard
+serves a granularity from its rollup when the fingerprint is current,
+so interactive queries read bucket counts instead of raw history. The
+count column is kept so coarser buckets can be re-derived from a finer
+rollup as a weighted mean without skewing the average.
+"""
+
+import logging
+from pathlib import Path
+
+import polars as pl
+
+from dashboard_helpers import (
+    GRANULARITY_OPTIONS,
+    METRIC_COLS,
+    ROLLUP_DIR,
+    ROLLUP_FINGERPRINT_FILE,
+    build_fingerprint,
+    list_parquet_files,
+    scan_speedtest_files,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_rollup(lf: pl.LazyFrame, interval: str) -> pl.DataFrame:
+    """Aggregate raw speedtest rows into per-bucket mean and count.
+
+    The bucket column keeps the 'timestamp' name so rollup rows are
+    interchangeable with raw rows in the dashboard pipeline.
+    """
+    return (
+        lf.group_by(pl.col("timestamp").dt.truncate(interval).alias("timestamp"))
+        .agg(pl.col(METRIC_COLS).mean(), pl.len().alias("count"))
+        .sort("timestamp")
+        .collect(engine="streaming")
+    )
+
+
+def write_rollups(uploads_dir: str = "uploads", rollup_dir: str = ROLLUP_DIR) -> None:
+    """Build and persist a rollup for every non-raw granularity."""
+    files = list_parquet_files(uploads_dir)
+    if not files:
+        logger.warning("No parquet files under %s; nothing to roll up", uploads_dir)
+        return
+
+    lf = scan_speedtest_files(files)
+    for label, interval in GRANULARITY_OPTIONS.items():
+        if interval is None:
+            continue  # Raw is the source data itself
+        out_dir = Path(rollup_dir) / interval
+        out_dir.mkdir(parents=True, exist_ok=True)
+        rollup = build_rollup(lf, interval)
+        rollup.write_parquet(out_dir / "rollup.parquet")
+        logger.info("Wrote %d %s buckets to %s", len(rollup), label, out_dir)
+
+    # Written last so a crash mid-run leaves the rollups marked stale.
+    (Path(rollup_dir) / ROLLUP_FINGERPRINT_FILE).write_text(build_fingerprint(files))
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    write_rollups()
+
+
+if __name__ == "__main__":
+    main()
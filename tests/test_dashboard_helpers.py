@@ -13,8 +13,11 @@ from dashboard_helpers import (
     _ProfileContext,
     aggregate,
     build_cache_key,
+    build_fingerprint,
+    downsample_for_plot,
     get_aggregated_data,
     get_or_create_cache_dir,
+    list_parquet_files,
 )
 
 
@@ -39,31 +42,69 @@ def sample_df() -> pl.DataFrame:
     )
 
 
+# --- list_parquet_files / build_fingerprint ---
+
+
+class TestListParquetFiles:
+    def test_finds_nested_parquets(self):
+        with tempfile.TemporaryDirectory() as root:
+            nested = f"{root}/location=home/year=2024"
+            import os
+
+            os.makedirs(nested)
+            open(f"{nested}/speedtest_001.parquet", "wb").close()
+            open(f"{nested}/notes.txt", "wb").close()
+
+            files = list_parquet_files(root)
+            assert len(files) == 1
+            assert files[0][0].endswith("speedtest_001.parquet")
+
+    def test_missing_root_returns_empty(self):
+        assert list_parquet_files("/nonexistent/path") == ()
+
+
+class TestBuildFingerprint:
+    def test_deterministic(self):
+        files = (("a.parquet", 10, 100), ("b.parquet", 20, 200))
+        assert build_fingerprint(files) == build_fingerprint(files)
+
+    def test_changed_mtime_changes_fingerprint(self):
+        before = (("a.parquet", 10, 100),)
+        after = (("a.parquet", 10, 101),)
+        assert build_fingerprint(before) != build_fingerprint(after)
+
+
 # --- build_cache_key ---
 
 
 class TestBuildCacheKey:
     def test_deterministic(self):
         """Same inputs always produce the same key."""
-        key1 = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Hourly")
-        key2 = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        key1 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        key2 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
         assert key1 == key2
 
     def test_different_granularity_different_key(self):
         """Different granularity produces different key."""
-        key1 = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Hourly")
-        key2 = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Daily")
+        key1 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        key2 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Daily")
         assert key1 != key2
 
     def test_different_dates_different_key(self):
         """Different date range produces different key."""
-        key1 = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Hourly")
-        key2 = build_cache_key(date(2024, 2, 1), date(2024, 2, 28), "Hourly")
+        key1 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        key2 = build_cache_key("fp1", date(2024, 2, 1), date(2024, 2, 28), "Hourly")
+        assert key1 != key2
+
+    def test_different_fingerprint_different_key(self):
+        """A data change must never resolve to an old cache file."""
+        key1 = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        key2 = build_cache_key("fp2", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
         assert key1 != key2
 
-    def test_ends_with_csv(self):
-        key = build_cache_key(date(2024, 1, 1), date(2024, 1, 31), "Hourly")
-        assert key.endswith(".csv")
+    def test_ends_with_arrow(self):
+        key = build_cache_key("fp1", date(2024, 1, 1), date(2024, 1, 31), "Hourly")
+        assert key.endswith(".arrow")
 
 
 # --- get_or_create_cache_dir ---
@@ -140,6 +181,28 @@ class TestAggregate:
             aggregate(sample_df, "InvalidGranularity")
 
 
+# --- downsample_for_plot ---
+
+
+class TestDownsampleForPlot:
+    def test_small_frame_passes_through(self, sample_df):
+        result = downsample_for_plot(sample_df, target=100)
+        assert result.shape == sample_df.shape
+
+    def test_large_frame_is_reduced(self):
+        df = pl.DataFrame({"value": list(range(10_000))})
+        result = downsample_for_plot(df, target=100)
+        assert len(result) < len(df)
+        # Stride flooring means we can land up to 2x the target, never more.
+        assert len(result) <= 2 * 100
+
+    def test_order_preserved(self):
+        df = pl.DataFrame({"value": list(range(1000))})
+        result = downsample_for_plot(df, target=10)
+        values = result["value"].to_list()
+        assert values == sorted(values)
+
+
 # --- get_aggregated_data ---
 
 
@@ -147,13 +210,13 @@ class TestGetAggregatedData:
     def test_cache_miss_then_hit(self, sample_df):
         with tempfile.TemporaryDirectory() as cache_dir:
             result1, hit1 = get_aggregated_data(
-                sample_df, date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
             )
             assert hit1 is False
             assert len(result1) > 0
 
             result2, hit2 = get_aggregated_data(
-                sample_df, date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
             )
             assert hit2 is True
             assert result1.shape == result2.shape
@@ -161,15 +224,46 @@ class TestGetAggregatedData:
     def test_different_granularity_no_cache_hit(self, sample_df):
         with tempfile.TemporaryDirectory() as cache_dir:
             _, hit1 = get_aggregated_data(
-                sample_df, date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
             )
             assert hit1 is False
 
             _, hit2 = get_aggregated_data(
-                sample_df, date(2024, 1, 1), date(2024, 1, 2), "Daily", cache_dir
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Daily", cache_dir
             )
             assert hit2 is False
 
+    def test_changed_fingerprint_no_cache_hit(self, sample_df):
+        """New data under the same dates must bypass the old cache file."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            _, hit1 = get_aggregated_data(
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
+            )
+            assert hit1 is False
+
+            changed = sample_df.with_columns(pl.col("download_mbps") + 1)
+            result, hit2 = get_aggregated_data(
+                changed, "fp2", date(2024, 1, 1), date(2024, 1, 2), "Hourly", cache_dir
+            )
+            assert hit2 is False
+            # Hour 0 of day 1: 100.0 in the old data, 101.0 after the change.
+            assert result.sort(TIME_COL).row(0, named=True)["download_mbps"] == pytest.approx(101.0)
+
+    def test_cheap_granularity_skips_disk_cache(self, sample_df):
+        """Daily output is tiny, so it is recomputed rather than cached."""
+        import os
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            _, hit1 = get_aggregated_data(
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Daily", cache_dir
+            )
+            _, hit2 = get_aggregated_data(
+                sample_df, "fp1", date(2024, 1, 1), date(2024, 1, 2), "Daily", cache_dir
+            )
+            assert hit1 is False
+            assert hit2 is False
+            assert os.listdir(cache_dir) == []
+
 
 # --- _ProfileContext ---
 
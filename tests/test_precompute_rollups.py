@@ -0,0 +1,90 @@
+"""Tests for the precompute_rollups script."""
+
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+from dashboard_helpers import (
+    METRIC_COLS,
+    ROLLUP_FINGERPRINT_FILE,
+    aggregate,
+    build_fingerprint,
+    list_parquet_files,
+    load_rollup,
+    scan_speedtest_files,
+)
+from precompute_rollups import build_rollup, write_rollups
+
+
+@pytest.fixture
+def uploads_dir(tmp_path) -> str:
+    """Write a small raw-schema parquet tree like uploads/."""
+    day_dir = tmp_path / "uploads" / "location=home" / "year=2024" / "month=01" / "day=01"
+    day_dir.mkdir(parents=True)
+    pl.DataFrame(
+        {
+            "timestamp": [
+                datetime(2024, 1, 1, h, 30, tzinfo=timezone.utc) for h in range(6)
+            ],
+            "download": [float((h + 1) * 100_000_000) for h in range(6)],
+            "upload": [float((h + 1) * 10_000_000) for h in range(6)],
+            "ping": [float(5 + h) for h in range(6)],
+        }
+    ).write_parquet(day_dir / "speedtest_001.parquet")
+    return str(tmp_path / "uploads")
+
+
+class TestBuildRollup:
+    def test_buckets_and_counts(self, uploads_dir):
+        lf = scan_speedtest_files(list_parquet_files(uploads_dir))
+        rollup = build_rollup(lf, "3h")
+        # 6 hourly rows -> two 3h buckets of 3 rows each
+        assert len(rollup) == 2
+        assert rollup["count"].to_list() == [3, 3]
+        for col in METRIC_COLS:
+            assert col in rollup.columns
+
+    def test_keeps_timestamp_column_name(self, uploads_dir):
+        lf = scan_speedtest_files(list_parquet_files(uploads_dir))
+        rollup = build_rollup(lf, "1h")
+        assert "timestamp" in rollup.columns
+
+
+class TestWriteRollups:
+    def test_writes_all_intervals_and_fingerprint(self, uploads_dir, tmp_path):
+        rollup_dir = str(tmp_path / "rollups")
+        write_rollups(uploads_dir, rollup_dir)
+        for interval in ("1h", "3h", "6h", "12h", "1d"):
+            assert (Path(rollup_dir) / interval / "rollup.parquet").exists()
+        marker = Path(rollup_dir) / ROLLUP_FINGERPRINT_FILE
+        assert marker.read_text() == build_fingerprint(list_parquet_files(uploads_dir))
+
+    def test_empty_uploads_writes_nothing(self, tmp_path):
+        rollup_dir = str(tmp_path / "rollups")
+        write_rollups(str(tmp_path / "missing"), rollup_dir)
+        assert not os.path.exists(rollup_dir)
+
+
+class TestLoadRollup:
+    def test_fresh_rollup_matches_raw_aggregation(self, uploads_dir, tmp_path):
+        rollup_dir = str(tmp_path / "rollups")
+        write_rollups(uploads_dir, rollup_dir)
+        files = list_parquet_files(uploads_dir)
+        fingerprint = build_fingerprint(files)
+
+        rollup = load_rollup("1h", fingerprint, rollup_dir)
+        assert rollup is not None
+        from_rollup = aggregate(rollup, "Hourly")
+        from_raw = aggregate(scan_speedtest_files(files), "Hourly")
+        assert from_rollup.equals(from_raw)
+
+    def test_stale_fingerprint_returns_none(self, uploads_dir, tmp_path):
+        rollup_dir = str(tmp_path / "rollups")
+        write_rollups(uploads_dir, rollup_dir)
+        assert load_rollup("1h", "0000000000000000", rollup_dir) is None
+
+    def test_missing_rollup_dir_returns_none(self, tmp_path):
+        assert load_rollup("1h", "abc", str(tmp_path / "nope")) is None